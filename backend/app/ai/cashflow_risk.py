@@ -21,6 +21,37 @@ try:
 except ImportError:
     HAS_NUMPY = False
 
+# Integer codes for transaction_type in the array-based API; other types are ignored
+TYPE_OTHER = 0
+TYPE_INCOME = 1
+TYPE_EXPENSE = 2
+TYPE_TO_ID = {"income": TYPE_INCOME, "expense": TYPE_EXPENSE}
+
+
+def build_transaction_arrays(rows: List[Tuple]) -> Tuple:
+    """
+    Build the parallel arrays analyze_risk_arrays takes from (amount, category, transaction_type) rows.
+    
+    Returns (amounts, category_ids, type_ids, categories) where categories[i] names category id i
+    and missing categories share "Uncategorized". Requires numpy.
+    """
+    n = len(rows)
+    amount_col, category_col, type_col = zip(*rows) if n else ((), (), ())
+    
+    cat_to_id = {}
+    amounts = np.array(amount_col, dtype=np.float64)
+    category_ids = np.fromiter(
+        (cat_to_id.setdefault(category or "Uncategorized", len(cat_to_id)) for category in category_col),
+        dtype=np.intp,
+        count=n
+    )
+    type_ids = np.fromiter(
+        (TYPE_TO_ID.get(transaction_type, TYPE_OTHER) for transaction_type in type_col),
+        dtype=np.int8,
+        count=n
+    )
+    return amounts, category_ids, type_ids, list(cat_to_id)
+
 
 class CashFlowRiskAnalyzer:
     """
@@ -58,7 +89,17 @@ class CashFlowRiskAnalyzer:
             "goal_risks": List[Dict],      # Goal-conditioned risks
             "runway_days": float           # Days until failure (expected)
         }
+        
+        With numpy the dicts are converted once to parallel arrays and analyzed by
+        analyze_risk_arrays; the per-dict statistics below are the no-numpy fallback.
         """
+        if HAS_NUMPY:
+            return self.analyze_risk_arrays(
+                *build_transaction_arrays(self._transaction_rows(transactions)),
+                goals,
+                horizon_days
+            )
+        
         if not transactions:
             return self._empty_risk_result()
         
@@ -66,6 +107,46 @@ class CashFlowRiskAnalyzer:
         income_stats = self._compute_income_distribution(transactions)
         expense_stats = self._compute_expense_distributions(transactions)
         
+        return self._assemble_risk(income_stats, expense_stats, goals, horizon_days)
+    
+    def analyze_risk_arrays(
+        self,
+        amounts: "np.ndarray",
+        category_ids: "np.ndarray",
+        type_ids: "np.ndarray",
+        categories: List[str],
+        goals: Optional[List[Dict]] = None,
+        horizon_days: int = 30
+    ) -> Dict:
+        """
+        Array-based analyze_risk for callers that already hold parallel arrays.
+        
+        amounts, category_ids and type_ids (TYPE_* codes) describe one transaction per
+        index; categories[i] is the name for category id i. Per-category moments come
+        from np.bincount instead of per-row dicts. Requires numpy.
+        """
+        if len(amounts) == 0:
+            return self._empty_risk_result()
+        
+        income_stats = self._income_distribution_from_arrays(amounts, type_ids)
+        expense_stats = self._expense_distributions_from_arrays(
+            amounts, category_ids, type_ids, categories
+        )
+        
+        return self._assemble_risk(income_stats, expense_stats, goals, horizon_days)
+    
+    def _transaction_rows(self, transactions: List[Dict]) -> List[Tuple]:
+        """Project transaction dicts onto the (amount, category, transaction_type) rows build_transaction_arrays reads."""
+        return [(t["amount"], t.get("category"), t.get("transaction_type")) for t in transactions]
+    
+    def _assemble_risk(
+        self,
+        income_stats: Dict,
+        expense_stats: Dict,
+        goals: Optional[List[Dict]],
+        horizon_days: int
+    ) -> Dict:
+        """Combine income/expense distributions into the full risk result."""
         # Compute net cash flow distribution
         mean_cashflow = income_stats["mean"] - expense_stats["total_mean"]
         var_cashflow = income_stats["variance"] + expense_stats["total_variance"]
@@ -199,6 +280,100 @@ class CashFlowRiskAnalyzer:
             "category_stats": category_stats
         }
     
+    def _income_distribution_from_arrays(self, amounts: "np.ndarray", type_ids: "np.ndarray") -> Dict:
+        """Array version of _compute_income_distribution."""
+        income = np.abs(amounts[type_ids == TYPE_INCOME])
+        
+        if len(income) == 0:
+            return {"mean": 0.0, "variance": 0.0, "std": 0.0}
+        
+        mean = float(income.mean())
+        
+        if len(income) > 1:
+            variance = float(income.var(ddof=1))
+            std = math.sqrt(variance)
+        else:
+            # If only one income, assume some variance (10% of mean)
+            variance = (mean * 0.1) ** 2
+            std = mean * 0.1
+        
+        return {
+            "mean": mean,
+            "variance": variance,
+            "std": std,
+            "count": len(income)
+        }
+    
+    def _expense_distributions_from_arrays(
+        self,
+        amounts: "np.ndarray",
+        category_ids: "np.ndarray",
+        type_ids: "np.ndarray",
+        categories: List[str]
+    ) -> Dict:
+        """
+        Array version of _compute_expense_distributions.
+        
+        Per-category count, Σx and Σx² come from three np.bincount passes;
+        sample variance is (Σx² - n·μ²) / (n - 1).
+        """
+        expense_mask = type_ids == TYPE_EXPENSE
+        
+        if not expense_mask.any():
+            return {
+                "total_mean": 0.0,
+                "total_variance": 0.0,
+                "category_stats": {}
+            }
+        
+        expenses = np.abs(amounts[expense_mask])
+        expense_cats = category_ids[expense_mask]
+        n_categories = len(categories)
+        
+        counts = np.bincount(expense_cats, minlength=n_categories)
+        sums = np.bincount(expense_cats, weights=expenses, minlength=n_categories)
+        sums_sq = np.bincount(expense_cats, weights=expenses * expenses, minlength=n_categories)
+        
+        # Visit categories in order of first appearance, like the dict-based version
+        present, first_seen = np.unique(expense_cats, return_index=True)
+        
+        category_stats = {}
+        total_mean = 0.0
+        total_variance = 0.0
+        
+        for cat_id in present[np.argsort(first_seen)]:
+            count = int(counts[cat_id])
+            mean = float(sums[cat_id]) / count
+            total_mean += mean
+            
+            if count > 1:
+                variance = max(0.0, (float(sums_sq[cat_id]) - count * mean * mean) / (count - 1))
+                std = math.sqrt(variance)
+            else:
+                # Single transaction: assume 20% variance
+                variance = (mean * 0.2) ** 2
+                std = mean * 0.2
+            
+            total_variance += variance
+            
+            # Coefficient of variation (normalized risk)
+            cv = std / mean if mean > 0 else 0.0
+            
+            category_stats[categories[cat_id]] = {
+                "mean": mean,
+                "variance": variance,
+                "std": std,
+                "cv": cv,  # Coefficient of variation
+                "count": count
+            }
+        
+        return {
+            "total_mean": total_mean,
+            "total_variance": total_variance,
+            "total_std": math.sqrt(total_variance) if total_variance > 0 else 0.0,
+            "category_stats": category_stats
+        }
+    
     def _compute_failure_probability(
         self,
         mean_cashflow: float,
@@ -413,6 +588,13 @@ class CashFlowRiskAnalyzer:
             "dining": 0.8   # 20% decrease
         }
         """
+        if HAS_NUMPY:
+            return self.stress_test_arrays(
+                *build_transaction_arrays(self._transaction_rows(transactions)),
+                shock_scenarios,
+                goals
+            )
+        
         # Get base risk
         base_risk = self.analyze_risk(transactions, goals)
         
@@ -445,6 +627,41 @@ class CashFlowRiskAnalyzer:
             "scenarios": shock_scenarios
         }
     
+    def stress_test_arrays(
+        self,
+        amounts: "np.ndarray",
+        category_ids: "np.ndarray",
+        type_ids: "np.ndarray",
+        categories: List[str],
+        shock_scenarios: Dict[str, float],
+        goals: Optional[List[Dict]] = None
+    ) -> Dict:
+        """
+        Array version of stress_test: shocks are applied as one vectorized multiply.
+        
+        Income rows take the "income" factor; every other row takes its category's factor.
+        """
+        base_risk = self.analyze_risk_arrays(amounts, category_ids, type_ids, categories, goals)
+        
+        # Per-category shock factors, indexed by category id
+        category_factors = np.array([shock_scenarios.get(name, 1.0) for name in categories], dtype=np.float64)
+        income_factor = shock_scenarios.get("income", 1.0)
+        
+        shocked_amounts = amounts * np.where(type_ids == TYPE_INCOME, income_factor, category_factors[category_ids])
+        
+        shocked_risk = self.analyze_risk_arrays(shocked_amounts, category_ids, type_ids, categories, goals)
+        
+        return {
+            "base_risk": base_risk,
+            "shocked_risk": shocked_risk,
+            "delta": {
+                "failure_probability": shocked_risk["failure_probability"] - base_risk["failure_probability"],
+                "expected_shortfall": shocked_risk["expected_shortfall"] - base_risk["expected_shortfall"],
+                "mean_cashflow": shocked_risk["mean_cashflow"] - base_risk["mean_cashflow"]
+            },
+            "scenarios": shock_scenarios
+        }
+    
     def _empty_risk_result(self) -> Dict:
         """Return empty risk result when no transactions."""
         return {
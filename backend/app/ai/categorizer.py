@@ -1,4 +1,5 @@
 from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
 import re
 
 class TransactionCategorizer:
@@ -266,6 +267,10 @@ class TransactionCategorizer:
         self.lemmatized_keywords = {}
         if self.nlp:
             self._build_lemmatized_cache()
+        
+        # Results depend only on (normalized description, transaction type), and real feeds
+        # repeat the same merchants constantly - memoize per instance across requests
+        self._categorize_cached = lru_cache(maxsize=10_000)(self._categorize_normalized)
     
     def _build_lemmatized_cache(self):
         """Build a cache of lemmatized keywords for faster matching."""
@@ -311,6 +316,10 @@ class TransactionCategorizer:
         if not transaction_type:
             transaction_type = self._get_transaction_type_hint(amount, description)
         
+        return self._categorize_cached(description_lower, transaction_type)
+    
+    def _categorize_normalized(self, description_lower: str, transaction_type: str) -> Tuple[str, str, float]:
+        """Score a lowercased, stripped description against every category (uncached)."""
         # Process with spaCy if available
         doc = None
         lemmatized_description = None
@@ -464,12 +473,18 @@ class TransactionCategorizer:
     def batch_categorize(self, transactions: List[Dict]) -> List[Dict]:
         """Categorize multiple transactions at once with enhanced NLP."""
         results = []
+        # Duplicate (description, type) pairs in one batch are categorized once
+        batch_results = {}
         for transaction in transactions:
-            category, subcategory, confidence = self.categorize(
-                transaction.get("description", ""),
-                transaction.get("amount", 0.0),
-                transaction.get("transaction_type")
-            )
+            description = transaction.get("description", "")
+            key = ((description or "").lower().strip(), transaction.get("transaction_type"))
+            if key not in batch_results:
+                batch_results[key] = self.categorize(
+                    description,
+                    transaction.get("amount", 0.0),
+                    transaction.get("transaction_type")
+                )
+            category, subcategory, confidence = batch_results[key]
             transaction["category"] = category
             transaction["subcategory"] = subcategory
             transaction["confidence_score"] = confidence
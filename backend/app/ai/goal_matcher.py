@@ -1,13 +1,54 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import re
+import threading
+from cachetools import TTLCache
 from app import models
 
+# Optional numpy for batch scoring
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Type multiplier applied to the keyword score, per goal type: (counted transaction type, boost)
+GOAL_TYPE_SCORING = {
+    "savings": ("income", 1.2),
+    "debt_payoff": ("expense", 1.2),
+    "investment": ("expense", 1.0),
+    "purchase": ("income", 1.2),
+}
+
 class GoalMatcher:
     """Use NLP to match transactions to goals based on descriptions."""
     
+    # Goal keyword features keyed by (goal.id, goal.name): keywords come from the name alone, while
+    # updated_at changes on every progress update. Shared so every router's matcher sees the same
+    # invalidations
+    _features_cache = TTLCache(maxsize=1024, ttl=3600)
+    _features_lock = threading.Lock()
+    
     def __init__(self):
         pass
     
+    def goal_features(self, goal: models.Goal) -> Tuple[Dict[str, float], float]:
+        """Return (keywords, total keyword weight) for a goal, extracting them only when its name changed."""
+        key = (goal.id, goal.name)
+        with self._features_lock:
+            features = self._features_cache.get(key)
+        if features is None:
+            keywords = self.extract_keywords_from_goal(goal)
+            features = (keywords, sum(keywords.values()))
+            with self._features_lock:
+                self._features_cache[key] = features
+        return features
+    
+    def invalidate_goal(self, goal_id: int):
+        """Drop cached features for a goal after it is edited or deleted."""
+        with self._features_lock:
+            for key in [key for key in self._features_cache if key[0] == goal_id]:
+                self._features_cache.pop(key, None)
+    
     def extract_keywords_from_goal(self, goal: models.Goal) -> Dict[str, float]:
         """
         Extract keywords from goal name with weights.
@@ -47,22 +88,28 @@ class GoalMatcher:
         
         return keywords
     
-    def calculate_relevance_score(self, transaction: models.Transaction, goal: models.Goal) -> float:
+    def calculate_relevance_score(
+        self,
+        transaction: models.Transaction,
+        goal: models.Goal,
+        features: Optional[Tuple[Dict[str, float], float]] = None
+    ) -> float:
         """
         Calculate relevance score using weighted keyword matching.
         Returns score between 0.0 (no relevance) and 1.0 (high relevance).
         
         Strategy: Specific keywords (hawaii, emergency) must match for high scores.
         Generic keywords (savings, fund) alone give low scores.
+        
+        Pass features from goal_features() when scoring many transactions against one goal.
         """
-        goal_keywords = self.extract_keywords_from_goal(goal)
+        goal_keywords, total_weight = features if features is not None else self.goal_features(goal)
         description_lower = transaction.description.lower()
         
         if not goal_keywords:
             return 0.0
         
         # Calculate weighted match score
-        total_weight = sum(goal_keywords.values())
         matched_weight = 0.0
         
         for keyword, weight in goal_keywords.items():
@@ -107,6 +154,62 @@ class GoalMatcher:
         
         return min(1.0, base_score)
     
+    def build_vocabulary(self, goals: List[models.Goal]) -> Dict[str, int]:
+        """Map every keyword used by any of the goals to a column index."""
+        vocabulary = {}
+        for goal in goals:
+            for keyword in self.goal_features(goal)[0]:
+                vocabulary.setdefault(keyword, len(vocabulary))
+        return vocabulary
+    
+    def encode_transactions(self, transactions: List[models.Transaction], vocabulary: Dict[str, int]) -> "np.ndarray":
+        """
+        Encode transactions once as a (T, V) keyword-presence matrix over `vocabulary`.
+        
+        Entry [t, k] is 1.0 when keyword k occurs in transaction t's description, using the
+        same substring test as calculate_relevance_score.
+        """
+        keywords = list(vocabulary)
+        matrix = np.zeros((len(transactions), len(keywords)), dtype=np.float64)
+        for i, transaction in enumerate(transactions):
+            description_lower = transaction.description.lower()
+            matrix[i] = [keyword in description_lower for keyword in keywords]
+        return matrix
+    
+    def encode_goal(self, goal: models.Goal, vocabulary: Dict[str, int]) -> "np.ndarray":
+        """Encode a goal as a (V,) keyword-weight vector over `vocabulary`."""
+        vector = np.zeros(len(vocabulary), dtype=np.float64)
+        for keyword, weight in self.goal_features(goal)[0].items():
+            vector[vocabulary[keyword]] = weight
+        return vector
+    
+    def score_matrix(
+        self,
+        transaction_matrix: "np.ndarray",
+        goal_vector: "np.ndarray",
+        goal: models.Goal,
+        transaction_types: "np.ndarray"
+    ) -> "np.ndarray":
+        """
+        Relevance scores of all encoded transactions for one goal, as a (T,) array.
+        
+        Vectorized calculate_relevance_score: matched weight is one mat-vec product,
+        then the goal-type filter and boost are applied as masks.
+        """
+        total_weight = goal_vector.sum()
+        if total_weight == 0:
+            return np.zeros(len(transaction_matrix))
+        
+        base_scores = (transaction_matrix @ goal_vector) / total_weight
+        
+        if goal.goal_type in GOAL_TYPE_SCORING:
+            counted_type, boost = GOAL_TYPE_SCORING[goal.goal_type]
+            scores = np.minimum(1.0, base_scores * boost)
+            scores[transaction_types != counted_type] = 0.0
+            return scores
+        
+        return np.minimum(1.0, base_scores)
+    
     def should_count_toward_goal(self, transaction: models.Transaction, goal: models.Goal, threshold: float = 0.5) -> bool:
         """Determine if a transaction should count toward a goal."""
         score = self.calculate_relevance_score(transaction, goal)
@@ -115,8 +218,9 @@ class GoalMatcher:
     def match_transactions_to_goal(self, transactions: List[models.Transaction], goal: models.Goal) -> List[Dict]:
         """Match transactions to a goal and return relevant ones with scores."""
         matches = []
+        features = self.goal_features(goal)
         for txn in transactions:
-            score = self.calculate_relevance_score(txn, goal)
+            score = self.calculate_relevance_score(txn, goal, features)
             if score > 0:
                 matches.append({
                     "transaction": txn,
@@ -1,8 +1,38 @@
 from typing import Dict, List, Tuple
 from datetime import datetime, timedelta
+import math
 import random
 import statistics
 
+# Optional numpy for vectorized Monte Carlo
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from app.ai.simulations_kernels import HAS_NUMBA
+
+if HAS_NUMBA:
+    from app.ai.simulations_kernels import mc_paths
+
+# Upper bound on (paths x months) elements drawn at once, to keep memory flat for large runs
+_MC_BLOCK_ELEMENTS = 4_000_000
+
+# Below this many paths the vectorized NumPy path beats the JIT kernel's dispatch/thread overhead
+_NUMBA_MIN_SIMULATIONS = 1024
+
+def opportunity_cost_recommendation(
+    spending_amount: float,
+    future_value: float,
+    opportunity_cost: float,
+    time_horizon_years: float
+) -> str:
+    """Recommendation text for an opportunity-cost result."""
+    if opportunity_cost > spending_amount * 0.1:  # More than 10% opportunity cost
+        return f"Consider investing ${spending_amount:.2f} instead. Over {time_horizon_years} years, you could have ${future_value:.2f} (potential gain: ${opportunity_cost:.2f})."
+    return f"This spending has a moderate opportunity cost. If invested, ${spending_amount:.2f} could grow to ${future_value:.2f} over {time_horizon_years} years."
+
 class FinancialSimulator:
     def __init__(self):
         pass
@@ -87,7 +117,70 @@ class FinancialSimulator:
     ) -> Dict:
         """
         Run Monte Carlo simulation for investment planning.
+        
+        Monthly growth follows geometric Brownian motion: each month the contribution is
+        added and the balance is multiplied by exp((r - σ²/2)·dt + σ·√dt·Z), dt = 1/12.
         """
+        if not HAS_NUMPY:
+            return self._monte_carlo_investment_python(
+                initial_investment, monthly_contribution, years,
+                expected_return, volatility, simulations
+            )
+        
+        months = years * 12
+        dt = 1.0 / 12
+        mu = (expected_return - 0.5 * volatility ** 2) * dt
+        sigma = volatility * math.sqrt(dt)
+        rng = np.random.default_rng()
+        
+        if months <= 0:
+            final = np.full(simulations, float(initial_investment))
+        elif HAS_NUMBA and simulations >= _NUMBA_MIN_SIMULATIONS:
+            final = np.empty(simulations)
+            mc_paths(
+                simulations, months, float(initial_investment), float(monthly_contribution),
+                mu, sigma, final
+            )
+        else:
+            final = np.empty(simulations)
+            block = max(1, _MC_BLOCK_ELEMENTS // months)
+            for start in range(0, simulations, block):
+                n = min(block, simulations - start)
+                growth = np.exp(mu + sigma * rng.standard_normal((n, months)))
+                cum = np.cumprod(growth, axis=1)
+                # A contribution made in month k grows by months k..end: cum[-1] / cum[k] * growth[k]
+                final[start:start + n] = (
+                    initial_investment * cum[:, -1]
+                    + monthly_contribution * np.sum(cum[:, -1:] / cum * growth, axis=1)
+                )
+        
+        # Sort once; percentiles are then index lookups (same convention as the Python fallback)
+        # and the success count is a binary search for the doubling threshold
+        final.sort()
+        n = simulations
+        doubled_count = n - np.searchsorted(final, initial_investment * 2, side="right")
+        
+        return {
+            "simulations": simulations,
+            "mean_outcome": float(final.mean()),
+            "median_outcome": float((final[(n - 1) // 2] + final[n // 2]) / 2),
+            "percentile_5": float(final[int(n * 0.05)]),
+            "percentile_95": float(final[int(n * 0.95)]),
+            "percentile_25": float(final[int(n * 0.25)]),
+            "percentile_75": float(final[int(n * 0.75)]),
+            "success_probability": float(doubled_count / n)
+        }
+    
+    def _monte_carlo_investment_python(
+        self,
+        initial_investment: float,
+        monthly_contribution: float,
+        years: int,
+        expected_return: float,
+        volatility: float,
+        simulations: int
+    ) -> Dict:
+        """Pure-Python Monte Carlo fallback when numpy is not installed."""
         results = []
         
         for _ in range(simulations):
@@ -130,18 +223,14 @@ class FinancialSimulator:
         future_value = spending_amount * ((1 + expected_return) ** time_horizon_years)
         opportunity_cost = future_value - spending_amount
         
-        # Generate recommendation
-        if opportunity_cost > spending_amount * 0.1:  # More than 10% opportunity cost
-            recommendation = f"Consider investing ${spending_amount:.2f} instead. Over {time_horizon_years} years, you could have ${future_value:.2f} (potential gain: ${opportunity_cost:.2f})."
-        else:
-            recommendation = f"This spending has a moderate opportunity cost. If invested, ${spending_amount:.2f} could grow to ${future_value:.2f} over {time_horizon_years} years."
-        
         return {
             "spending_amount": spending_amount,
             "potential_investment_return": future_value,
             "time_horizon_years": time_horizon_years,
             "opportunity_cost": opportunity_cost,
-            "recommendation": recommendation
+            "recommendation": opportunity_cost_recommendation(
+                spending_amount, future_value, opportunity_cost, time_horizon_years
+            )
         }
 
 
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine, Base
 from app.routers import (
@@ -12,7 +13,8 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="FinSage - AI Finance Companion",
     description="An intelligent financial assistant with AI-powered insights, risk analysis, and personalized recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
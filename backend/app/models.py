@@ -25,7 +25,7 @@ class Transaction(Base):
     description = Column(String, nullable=False)
     category = Column(String, index=True)
     subcategory = Column(String)
-    date = Column(DateTime(timezone=True), nullable=False, index=True)
+    date = Column(DateTime(timezone=True), nullable=False, index=True)  # ix_transactions_date also serves ORDER BY date DESC
     transaction_type = Column(String)  # 'income' or 'expense'
     merchant = Column(String)
     ai_categorized = Column(Boolean, default=False)
@@ -34,6 +34,23 @@ class Transaction(Base):
     
     user = relationship("User", back_populates="transactions")
 
+class Receipt(Base):
+    __tablename__ = "receipts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, default="pending", index=True)  # 'pending', 'processing', 'done', 'failed'
+    filename = Column(String)
+    merchant = Column(String)
+    extracted_total = Column(Float)
+    extracted_text = Column(Text)
+    error = Column(Text)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    transaction = relationship("Transaction")
+
 class Goal(Base):
     __tablename__ = "goals"
     
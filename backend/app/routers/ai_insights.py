@@ -90,7 +90,7 @@ async def get_spending_patterns(
             "amount": t.amount,
             "description": t.description,
             "category": t.category,
-            "date": t.date.isoformat() if t.date else None
+            "date": t.date
         }
         for t in transactions
     ]
@@ -126,7 +126,7 @@ async def get_spending_forecast(
             "amount": t.amount,
             "description": t.description,
             "category": t.category,
-            "date": t.date.isoformat() if t.date else None
+            "date": t.date
         }
         for t in transactions
     ]
@@ -162,7 +162,7 @@ async def get_anomalies(
             "amount": t.amount,
             "description": t.description,
             "category": t.category,
-            "date": t.date.isoformat() if t.date else None
+            "date": t.date
         }
         for t in transactions
     ]
@@ -29,11 +29,13 @@ async def get_alerts(
 async def generate_alerts(db: Session = Depends(get_db)):
     """Generate new alerts based on current financial data."""
     user_id = 1  # TODO: Auth
+    now = datetime.now()
+    month_start = now - timedelta(days=30)
     
     # Get recent transactions
     transactions = db.query(models.Transaction).filter(
         models.Transaction.user_id == user_id,
-        models.Transaction.date >= datetime.now() - timedelta(days=90)
+        models.Transaction.date >= now - timedelta(days=90)
     ).all()
     
     # Get goals
@@ -50,7 +52,7 @@ async def generate_alerts(db: Session = Depends(get_db)):
             "category": t.category,
             "merchant": t.merchant,
             "transaction_type": t.transaction_type,
-            "date": t.date.isoformat() if t.date else None
+            "date": t.date
         }
         for t in transactions
     ]
@@ -74,7 +76,7 @@ async def generate_alerts(db: Session = Depends(get_db)):
     monthly_income = sum(
         t.amount for t in transactions
         if t.transaction_type == "income" and
-        t.date >= datetime.now() - timedelta(days=30)
+        t.date >= month_start
     )
     
     # Generate alerts
@@ -86,7 +88,7 @@ async def generate_alerts(db: Session = Depends(get_db)):
     )
     
     # Get existing alerts from the last 24 hours to avoid duplicates
-    recent_cutoff = datetime.now() - timedelta(hours=24)
+    recent_cutoff = now - timedelta(hours=24)
     existing_alerts = db.query(models.Alert).filter(
         models.Alert.user_id == user_id,
         models.Alert.created_at >= recent_cutoff
@@ -7,11 +7,19 @@ from app.ai.llm_chat import FinancialCoachChat
 from collections import defaultdict
 
 router = APIRouter()
-chat_ai = FinancialCoachChat()
+_chat_ai = None
+
+def get_chat_ai() -> FinancialCoachChat:
+    """Create the chat client on first use, so importing the app doesn't load the LLM SDKs."""
+    global _chat_ai
+    if _chat_ai is None:
+        _chat_ai = FinancialCoachChat()
+    return _chat_ai
 
 @router.get("/status")
 async def chat_status():
     """Check which AI provider is being used."""
+    chat_ai = get_chat_ai()
     return {
         "provider": chat_ai.provider if chat_ai.provider else "fallback",
         "has_client": chat_ai.client is not None,
@@ -26,11 +34,13 @@ async def chat(
     """Chat with the financial coach AI."""
     # Build context from user's financial data
     user_id = 1  # TODO: Get from authentication
+    now = datetime.now()
+    month_start = now - timedelta(days=30)
     
     # Get recent transactions
     transactions = db.query(models.Transaction).filter(
         models.Transaction.user_id == user_id,
-        models.Transaction.date >= datetime.now() - timedelta(days=90)
+        models.Transaction.date >= now - timedelta(days=90)
     ).all()
     
     # Get goals
@@ -45,13 +55,13 @@ async def chat(
     monthly_income = sum(
         t.amount for t in transactions
         if t.transaction_type == "income" and
-        t.date >= datetime.now() - timedelta(days=30)
+        t.date >= month_start
     )
     
     monthly_expenses = sum(
         abs(t.amount) for t in transactions
         if t.transaction_type == "expense" and
-        t.date >= datetime.now() - timedelta(days=30)
+        t.date >= month_start
     )
     
     # Calculate current balance (simplified)
@@ -89,7 +99,7 @@ async def chat(
     }
     
     # Get AI response
-    response = chat_ai.chat(message.message, context)
+    response = get_chat_ai().chat(message.message, context)
     
     return response
 
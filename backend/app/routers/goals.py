@@ -4,6 +4,7 @@ from typing import List
 from app.database import get_db
 from app import models, schemas
 from app.services.goal_tracker import GoalTracker
+from app.services.risk_cache import invalidate_risk_inputs
 
 router = APIRouter()
 goal_tracker = GoalTracker()  # Create instance
@@ -21,6 +22,10 @@ async def create_goal(goal: schemas.GoalCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_goal)
     
+    # Transaction writes only apply deltas, so seed progress from the existing transactions
+    goal_tracker.update_goal_progress(db_goal, db)
+    invalidate_risk_inputs(1)  # TODO: Auth
+    
     return db_goal
 
 @router.get("/", response_model=List[schemas.GoalResponse])
@@ -34,6 +39,7 @@ async def get_goals(
     # Optionally recalculate progress before returning
     if recalculate:
         goal_tracker.update_all_goals(user_id, db)
+        invalidate_risk_inputs(user_id)
     
     goals = db.query(models.Goal).filter(
         models.Goal.user_id == user_id
@@ -69,11 +75,19 @@ async def update_goal(
     if not db_goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     
+    # Progress depends on the name's keywords and the goal type; anything else keeps it valid
+    matching_changed = goal.name != db_goal.name or goal.goal_type != db_goal.goal_type
+    
     for key, value in goal.dict().items():
         setattr(db_goal, key, value)
     
     db.commit()
     db.refresh(db_goal)
+    goal_tracker.goal_matcher.invalidate_goal(goal_id)
+    
+    if matching_changed:
+        goal_tracker.update_goal_progress(db_goal, db)
+    invalidate_risk_inputs(1)  # TODO: Auth
     
     return db_goal
 
@@ -104,6 +118,7 @@ async def update_goal_progress(
     else:
         # Default: recalculate using NLP
         goal_tracker.update_goal_progress(db_goal, db)
+    invalidate_risk_inputs(1)  # TODO: Auth
     
     return db_goal
 
@@ -112,6 +127,7 @@ async def recalculate_all_goals(db: Session = Depends(get_db)):
     """Recalculate progress for all goals based on current transactions using NLP matching."""
     user_id = 1  # TODO: Auth
     updated_goals = goal_tracker.update_all_goals(user_id, db)
+    invalidate_risk_inputs(user_id)
     return {
         "message": f"Recalculated {len(updated_goals)} goals using NLP matching",
         "goals": updated_goals
@@ -130,5 +146,7 @@ async def delete_goal(goal_id: int, db: Session = Depends(get_db)):
     
     db.delete(goal)
     db.commit()
+    invalidate_risk_inputs(1)  # TODO: Auth
+    goal_tracker.goal_matcher.invalidate_goal(goal_id)
     
     return {"message": "Goal deleted"}
@@ -2,20 +2,116 @@
 API endpoints for probabilistic cash-flow risk analysis.
 """
 from fastapi import APIRouter, Depends, Query, Body
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from app.database import get_db
 from app import models, schemas
-from app.ai.cashflow_risk import CashFlowRiskAnalyzer
+from app.ai.cashflow_risk import CashFlowRiskAnalyzer, HAS_NUMPY, build_transaction_arrays
+from app.services.risk_cache import get_risk_inputs, set_risk_inputs
 
 router = APIRouter()
 risk_analyzer = CashFlowRiskAnalyzer()
 
-@router.get("/cashflow-risk", response_model=schemas.CashFlowRiskAnalysis)
+# Column order of the Core selects below; rows are zipped straight into analyzer dicts
+TRANSACTION_KEYS = ("id", "amount", "description", "category", "transaction_type")
+GOAL_KEYS = ("id", "name", "current_amount", "target_amount", "target_date")
+
+def _load_transaction_dicts(db: Session, user_id: int, start_date: datetime) -> List[Dict]:
+    """Fetch the user's transactions since start_date as plain dicts, without building ORM objects."""
+    rows = db.execute(
+        select(
+            models.Transaction.id,
+            models.Transaction.amount,
+            models.Transaction.description,
+            models.Transaction.category,
+            models.Transaction.transaction_type
+        ).where(
+            models.Transaction.user_id == user_id,
+            models.Transaction.date >= start_date
+        )
+    ).all()
+    return [dict(zip(TRANSACTION_KEYS, r)) for r in rows]
+
+def _load_transaction_arrays(db: Session, user_id: int, start_date: datetime) -> Tuple:
+    """
+    Fetch the user's transactions since start_date as parallel arrays for analyze_risk_arrays.
+    
+    Returns (amounts, category_ids, type_ids, categories) where categories[i] names category id i.
+    """
+    rows = db.execute(
+        select(
+            models.Transaction.amount,
+            models.Transaction.category,
+            models.Transaction.transaction_type
+        ).where(
+            models.Transaction.user_id == user_id,
+            models.Transaction.date >= start_date
+        )
+    ).all()
+    return build_transaction_arrays(rows)
+
+def _load_goal_dicts(db: Session, user_id: int) -> List[Dict]:
+    """Fetch the user's goals as plain dicts, without building ORM objects."""
+    rows = db.execute(
+        select(
+            models.Goal.id,
+            models.Goal.name,
+            models.Goal.current_amount,
+            models.Goal.target_amount,
+            models.Goal.target_date
+        ).where(models.Goal.user_id == user_id)
+    ).all()
+    return [dict(zip(GOAL_KEYS, r)) for r in rows]
+
+def _to_risk_model(risk: Dict) -> schemas.CashFlowRiskAnalysis:
+    """Wrap an analyzer risk dict in the response model without re-validating it."""
+    return schemas.CashFlowRiskAnalysis.model_construct(
+        failure_probability=risk["failure_probability"],
+        expected_shortfall=risk["expected_shortfall"],
+        mean_cashflow=risk["mean_cashflow"],
+        std_cashflow=risk["std_cashflow"],
+        risk_drivers=[
+            schemas.RiskDriver.model_construct(**driver) for driver in risk["risk_drivers"]
+        ],
+        goal_risks=[
+            schemas.GoalRisk.model_construct(**goal_risk) for goal_risk in risk["goal_risks"]
+        ],
+        runway_days=risk["runway_days"],
+        income_stats=risk["income_stats"],
+        expense_stats=risk["expense_stats"]
+    )
+
+def get_user_risk_inputs(db: Session = Depends(get_db)) -> Tuple:
+    """
+    Dependency returning (transactions, goals) for the risk endpoints.
+    
+    transactions is the (amounts, category_ids, type_ids, categories) array tuple when numpy
+    is available, otherwise a list of dicts. Covers the last 90 days; cached for 60 seconds.
+    """
+    user_id = 1  # TODO: Auth
+    
+    cached = get_risk_inputs(user_id)
+    if cached is not None:
+        return cached
+    
+    # Get recent transactions (last 90 days for distribution estimation) and goals
+    start_date = datetime.now() - timedelta(days=90)
+    if HAS_NUMPY:
+        transactions = _load_transaction_arrays(db, user_id, start_date)
+    else:
+        transactions = _load_transaction_dicts(db, user_id, start_date)
+    inputs = (transactions, _load_goal_dicts(db, user_id))
+    
+    set_risk_inputs(user_id, inputs)
+    return inputs
+
+@router.get("/cashflow-risk", response_model=schemas.CashFlowRiskAnalysis, response_class=ORJSONResponse)
 async def get_cashflow_risk(
     horizon_days: int = Query(30, description="Risk analysis horizon in days"),
-    db: Session = Depends(get_db)
+    risk_inputs: Tuple = Depends(get_user_risk_inputs)
 ):
     """
     Compute probabilistic cash-flow risk analysis.
@@ -26,73 +122,35 @@ async def get_cashflow_risk(
     - Risk attribution: Which categories drive risk
     - Goal-conditioned risks: Probability of missing goals
     """
-    user_id = 1  # TODO: Auth
-    
-    # Get recent transactions (last 90 days for distribution estimation)
-    start_date = datetime.now() - timedelta(days=90)
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.date >= start_date
-    ).all()
-    
-    # Get goals
-    goals = db.query(models.Goal).filter(
-        models.Goal.user_id == user_id
-    ).all()
-    
-    # Convert to dict format
-    transaction_dicts = [
-        {
-            "id": t.id,
-            "amount": t.amount,
-            "description": t.description,
-            "category": t.category,
-            "transaction_type": t.transaction_type,
-            "date": t.date.isoformat() if t.date else None
-        }
-        for t in transactions
-    ]
-    
-    goals_dicts = [
-        {
-            "id": g.id,
-            "name": g.name,
-            "current_amount": g.current_amount,
-            "target_amount": g.target_amount,
-            "target_date": g.target_date.isoformat() if g.target_date else None
-        }
-        for g in goals
-    ]
+    transactions, goals_dicts = risk_inputs
     
     # Run risk analysis
-    risk_result = risk_analyzer.analyze_risk(
-        transaction_dicts,
-        goals_dicts,
-        horizon_days
-    )
+    if HAS_NUMPY:
+        amounts, category_ids, type_ids, categories = transactions
+        risk_result = risk_analyzer.analyze_risk_arrays(
+            amounts,
+            category_ids,
+            type_ids,
+            categories,
+            goals_dicts,
+            horizon_days
+        )
+    else:
+        risk_result = risk_analyzer.analyze_risk(
+            transactions,
+            goals_dicts,
+            horizon_days
+        )
     
-    # Convert to response format
-    return schemas.CashFlowRiskAnalysis(
-        failure_probability=risk_result["failure_probability"],
-        expected_shortfall=risk_result["expected_shortfall"],
-        mean_cashflow=risk_result["mean_cashflow"],
-        std_cashflow=risk_result["std_cashflow"],
-        risk_drivers=[
-            schemas.RiskDriver(**driver) for driver in risk_result["risk_drivers"]
-        ],
-        goal_risks=[
-            schemas.GoalRisk(**risk) for risk in risk_result["goal_risks"]
-        ],
-        runway_days=risk_result["runway_days"],
-        income_stats=risk_result["income_stats"],
-        expense_stats=risk_result["expense_stats"]
-    )
+    # Convert to response format (analyzer output is trusted, so skip validation)
+    return _to_risk_model(risk_result)
 
-@router.post("/stress-test", response_model=schemas.StressTestResult)
+@router.post("/stress-test", response_model=schemas.StressTestResult, response_class=ORJSONResponse)
 async def stress_test_cashflow(
     scenarios: Dict[str, float] = Body(..., description="Shock scenarios, e.g., {'rent': 1.1, 'income': 0.9}"),
     horizon_days: int = Query(30, description="Risk analysis horizon in days"),
-    db: Session = Depends(get_db)
+    summary_only: bool = Query(False, description="Return only the delta and scenarios"),
+    risk_inputs: Tuple = Depends(get_user_risk_inputs)
 ):
     """
     Stress test: Apply shocks and recompute risk.
@@ -104,84 +162,33 @@ async def stress_test_cashflow(
         "dining": 0.8     # 20% decrease
     }
     """
-    user_id = 1  # TODO: Auth
-    
-    # Get recent transactions
-    start_date = datetime.now() - timedelta(days=90)
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.date >= start_date
-    ).all()
-    
-    # Get goals
-    goals = db.query(models.Goal).filter(
-        models.Goal.user_id == user_id
-    ).all()
-    
-    # Convert to dict format
-    transaction_dicts = [
-        {
-            "id": t.id,
-            "amount": t.amount,
-            "description": t.description,
-            "category": t.category,
-            "transaction_type": t.transaction_type,
-            "date": t.date.isoformat() if t.date else None
-        }
-        for t in transactions
-    ]
-    
-    goals_dicts = [
-        {
-            "id": g.id,
-            "name": g.name,
-            "current_amount": g.current_amount,
-            "target_amount": g.target_amount,
-            "target_date": g.target_date.isoformat() if g.target_date else None
-        }
-        for g in goals
-    ]
+    transactions, goals_dicts = risk_inputs
     
     # Run stress test
-    stress_result = risk_analyzer.stress_test(
-        transaction_dicts,
-        scenarios,
-        goals_dicts
-    )
+    if HAS_NUMPY:
+        amounts, category_ids, type_ids, categories = transactions
+        stress_result = risk_analyzer.stress_test_arrays(
+            amounts,
+            category_ids,
+            type_ids,
+            categories,
+            scenarios,
+            goals_dicts
+        )
+    else:
+        stress_result = risk_analyzer.stress_test(
+            transactions,
+            scenarios,
+            goals_dicts
+        )
+    
+    if summary_only:
+        return ORJSONResponse({"delta": stress_result["delta"], "scenarios": stress_result["scenarios"]})
     
-    # Convert to response format
-    return schemas.StressTestResult(
-        base_risk=schemas.CashFlowRiskAnalysis(
-            failure_probability=stress_result["base_risk"]["failure_probability"],
-            expected_shortfall=stress_result["base_risk"]["expected_shortfall"],
-            mean_cashflow=stress_result["base_risk"]["mean_cashflow"],
-            std_cashflow=stress_result["base_risk"]["std_cashflow"],
-            risk_drivers=[
-                schemas.RiskDriver(**driver) for driver in stress_result["base_risk"]["risk_drivers"]
-            ],
-            goal_risks=[
-                schemas.GoalRisk(**risk) for risk in stress_result["base_risk"]["goal_risks"]
-            ],
-            runway_days=stress_result["base_risk"]["runway_days"],
-            income_stats=stress_result["base_risk"]["income_stats"],
-            expense_stats=stress_result["base_risk"]["expense_stats"]
-        ),
-        shocked_risk=schemas.CashFlowRiskAnalysis(
-            failure_probability=stress_result["shocked_risk"]["failure_probability"],
-            expected_shortfall=stress_result["shocked_risk"]["expected_shortfall"],
-            mean_cashflow=stress_result["shocked_risk"]["mean_cashflow"],
-            std_cashflow=stress_result["shocked_risk"]["std_cashflow"],
-            risk_drivers=[
-                schemas.RiskDriver(**driver) for driver in stress_result["shocked_risk"]["risk_drivers"]
-            ],
-            goal_risks=[
-                schemas.GoalRisk(**risk) for risk in stress_result["shocked_risk"]["goal_risks"]
-            ],
-            runway_days=stress_result["shocked_risk"]["runway_days"],
-            income_stats=stress_result["shocked_risk"]["income_stats"],
-            expense_stats=stress_result["shocked_risk"]["expense_stats"]
-        ),
+    # Convert to response format (analyzer output is trusted, so skip validation)
+    return schemas.StressTestResult.model_construct(
+        base_risk=_to_risk_model(stress_result["base_risk"]),
+        shocked_risk=_to_risk_model(stress_result["shocked_risk"]),
         delta=stress_result["delta"],
         scenarios=stress_result["scenarios"]
     )
-
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, Query, Body
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from app.database import get_db
 from app import models, schemas
-from app.ai.simulations import FinancialSimulator
-from collections import defaultdict
+from app.ai.simulations import FinancialSimulator, opportunity_cost_recommendation
 
 router = APIRouter()
 simulator = FinancialSimulator()
@@ -45,17 +46,19 @@ async def simulate_goal_scenario(
         except (ValueError, TypeError):
             raise HTTPException(status_code=400, detail=f"Invalid reduction percentage for '{key}': must be a number")
     
-    # Get recent spending by category
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == 1,  # TODO: Auth
-        models.Transaction.transaction_type == "expense",
-        models.Transaction.date >= datetime.now() - timedelta(days=30)
+    # Get recent spending by category, summed in SQL
+    rows = db.execute(
+        select(
+            models.Transaction.category,
+            func.sum(func.abs(models.Transaction.amount))
+        ).where(
+            models.Transaction.user_id == 1,  # TODO: Auth
+            models.Transaction.transaction_type == "expense",
+            models.Transaction.date >= datetime.now() - timedelta(days=30)
+        ).group_by(models.Transaction.category)
     ).all()
     
-    category_spending = defaultdict(float)
-    for txn in transactions:
-        if txn.category:
-            category_spending[txn.category] += abs(txn.amount)
+    category_spending = {category: total for category, total in rows if category}
     
     # Calculate current monthly contribution (simplified)
     monthly_contribution = 500.0  # Default, could be calculated from income - expenses
@@ -64,13 +67,13 @@ async def simulate_goal_scenario(
         current_savings=goal.current_amount,
         monthly_contribution=monthly_contribution,
         target_amount=goal.target_amount,
-        current_monthly_spending=dict(category_spending),
+        current_monthly_spending=category_spending,
         reduction_percentages=reduction_percentages
     )
     
     return result
 
-@router.post("/monte-carlo", response_model=schemas.MonteCarloResult)
+@router.post("/monte-carlo", response_model=schemas.MonteCarloResult, response_class=ORJSONResponse)
 async def monte_carlo_simulation(
     initial_investment: float,
     monthly_contribution: float,
@@ -89,7 +92,8 @@ async def monte_carlo_simulation(
         simulations=simulations
     )
     
-    return schemas.MonteCarloResult(**result)
+    # Simulator output is trusted, so skip validation
+    return schemas.MonteCarloResult.model_construct(**result)
 
 @router.post("/opportunity-cost", response_model=schemas.OpportunityCost)
 async def calculate_opportunity_cost(
@@ -98,11 +102,16 @@ async def calculate_opportunity_cost(
     expected_return: float = 0.07
 ):
     """Calculate opportunity cost of spending vs investing."""
-    result = simulator.calculate_opportunity_cost(
+    # Closed form, computed inline: FV = spending * (1 + r)^t
+    future_value = spending_amount * (1.0 + expected_return) ** time_horizon_years
+    opportunity_cost = future_value - spending_amount
+    
+    return schemas.OpportunityCost.model_construct(
         spending_amount=spending_amount,
+        potential_investment_return=future_value,
         time_horizon_years=time_horizon_years,
-        expected_return=expected_return
+        opportunity_cost=opportunity_cost,
+        recommendation=opportunity_cost_recommendation(
+            spending_amount, future_value, opportunity_cost, time_horizon_years
+        )
     )
-    
-    return schemas.OpportunityCost(**result)
-
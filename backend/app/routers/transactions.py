@@ -1,16 +1,29 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+from types import SimpleNamespace
 from app.database import get_db
 from app import models, schemas
 from app.ai.categorizer import TransactionCategorizer
 from app.services.goal_tracker import GoalTracker
+from app.services.risk_cache import invalidate_risk_inputs
 
 router = APIRouter()
 categorizer = TransactionCategorizer()
 goal_tracker = GoalTracker()  # Create instance
 
+def _goal_snapshot(transaction: models.Transaction) -> SimpleNamespace:
+    """Copy the fields goal matching reads, so a transaction's old values survive an edit/delete."""
+    return SimpleNamespace(
+        user_id=transaction.user_id,
+        description=transaction.description,
+        amount=transaction.amount,
+        transaction_type=transaction.transaction_type
+    )
+
 @router.post("/", response_model=schemas.TransactionResponse)
 async def create_transaction(
     transaction: schemas.TransactionCreate,
@@ -18,7 +31,9 @@ async def create_transaction(
 ):
     """Create a new transaction and auto-categorize it."""
     # Auto-categorize using AI (pass transaction_type for better accuracy)
-    category, subcategory, confidence = categorizer.categorize(
+    # NLP inference is CPU-bound, so run it off the event loop
+    category, subcategory, confidence = await asyncio.to_thread(
+        categorizer.categorize,
         transaction.description,
         transaction.amount,
         transaction.transaction_type
@@ -42,14 +57,16 @@ async def create_transaction(
     db.commit()
     db.refresh(db_transaction)
     
-    # Automatically update goal progress
+    # Automatically update goal progress (incrementally - only this transaction is scored)
     try:
-        goal_tracker.update_all_goals(user_id=1, db=db)  # TODO: Get from auth
+        goal_tracker.apply_transaction_delta(db_transaction, +1, db)
         print(f"✓ Updated goals after transaction creation")  # Debug log
     except Exception as e:
         import traceback
         print(f"❌ Error updating goals: {e}")
         traceback.print_exc()  # Show full error
+    # After the goal deltas commit, so a concurrent risk request cannot re-cache old goal progress
+    invalidate_risk_inputs(1)  # TODO: Auth
     
     return db_transaction
 
@@ -103,9 +120,12 @@ async def update_transaction(
     if not db_transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    old_snapshot = _goal_snapshot(db_transaction)
+    
     # Re-categorize if description changed
     if transaction.description != db_transaction.description:
-        category, subcategory, confidence = categorizer.categorize(
+        category, subcategory, confidence = await asyncio.to_thread(
+            categorizer.categorize,
             transaction.description,
             transaction.amount,
             transaction.transaction_type or db_transaction.transaction_type
@@ -120,11 +140,16 @@ async def update_transaction(
     db.commit()
     db.refresh(db_transaction)
     
-    # Automatically update goal progress
+    # Automatically update goal progress: retract the old values, apply the new ones
     try:
-        goal_tracker.update_all_goals(user_id=1, db=db)  # TODO: Get from auth
+        goal_tracker.apply_transaction_deltas(
+            user_id=1,  # TODO: Get from auth
+            changes=[(old_snapshot, -1), (db_transaction, +1)],
+            db=db
+        )
     except Exception as e:
         print(f"Error updating goals: {e}")
+    invalidate_risk_inputs(1)  # TODO: Auth
     
     return db_transaction
 
@@ -139,14 +164,22 @@ async def delete_transaction(transaction_id: int, db: Session = Depends(get_db))
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    deleted_snapshot = _goal_snapshot(transaction)
+    # Unlink any receipt that created it; ondelete="SET NULL" does the same where FKs are enforced
+    db.execute(
+        update(models.Receipt)
+        .where(models.Receipt.transaction_id == transaction_id)
+        .values(transaction_id=None)
+    )
     db.delete(transaction)
     db.commit()
     
     # Automatically update goal progress
     try:
-        goal_tracker.update_all_goals(user_id=1, db=db)  # TODO: Get from auth
+        goal_tracker.apply_transaction_delta(deleted_snapshot, -1, db)
     except Exception as e:
         print(f"Error updating goals: {e}")
+    invalidate_risk_inputs(1)  # TODO: Auth
     
     return {"message": "Transaction deleted"}
 
@@ -156,34 +189,46 @@ async def create_transactions_batch(
     db: Session = Depends(get_db)
 ):
     """Create multiple transactions at once with batch categorization."""
-    db_transactions = []
+    if not transactions:
+        return []
     
     # Batch categorize
     transaction_dicts = [t.dict() for t in transactions]
-    categorized = categorizer.batch_categorize(transaction_dicts)
+    categorized = await asyncio.to_thread(categorizer.batch_categorize, transaction_dicts)
     
-    for txn_data in categorized:
-        db_transaction = models.Transaction(
+    rows = [
+        {
             **{k: v for k, v in txn_data.items() if k != "category" and k != "subcategory" and k != "confidence_score" and k != "ai_categorized"},
-            category=txn_data.get("category"),
-            subcategory=txn_data.get("subcategory"),
-            ai_categorized=txn_data.get("ai_categorized", True),
-            confidence_score=txn_data.get("confidence_score"),
-            user_id=1  # TODO: Auth
-        )
-        db.add(db_transaction)
-        db_transactions.append(db_transaction)
-    
+            "category": txn_data.get("category"),
+            "subcategory": txn_data.get("subcategory"),
+            "ai_categorized": txn_data.get("ai_categorized", True),
+            "confidence_score": txn_data.get("confidence_score"),
+            "user_id": 1  # TODO: Auth
+        }
+        for txn_data in categorized
+    ]
+    
+    # One multi-row INSERT ... RETURNING instead of an add + refresh SELECT per transaction
+    db_transactions = db.execute(
+        insert(models.Transaction).returning(
+            *models.Transaction.__table__.columns,
+            sort_by_parameter_order=True
+        ),
+        rows
+    ).all()
     db.commit()
     
-    for txn in db_transactions:
-        db.refresh(txn)
-    
-    # Automatically update goal progress
+    # Automatically update goal progress - deltas are summed per goal, then committed once
     try:
-        goal_tracker.update_all_goals(user_id=1, db=db)  # TODO: Get from auth
+        goal_tracker.apply_transaction_deltas(
+            user_id=1,  # TODO: Get from auth
+            changes=[(txn, +1) for txn in db_transactions],
+            db=db
+        )
     except Exception as e:
         print(f"Error updating goals: {e}")
+    invalidate_risk_inputs(1)  # TODO: Auth
     
-    return db_transactions
+    # Rows came straight from the database, so skip re-validating them
+    return [schemas.TransactionResponse.model_construct(**txn._mapping) for txn in db_transactions]
 
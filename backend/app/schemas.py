@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
@@ -14,8 +14,7 @@ class UserResponse(UserBase):
     id: int
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, validate_assignment=False)
 
 # Transaction schemas
 class TransactionBase(BaseModel):
@@ -37,8 +36,7 @@ class TransactionResponse(TransactionBase):
     confidence_score: Optional[float] = None
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, validate_assignment=False)
 
 # Goal schemas
 class GoalBase(BaseModel):
@@ -58,8 +56,7 @@ class GoalResponse(GoalBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, validate_assignment=False)
 
 # Alert schemas
 class AlertResponse(BaseModel):
@@ -73,8 +70,7 @@ class AlertResponse(BaseModel):
     alert_metadata: Optional[Dict[str, Any]] = None
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, validate_assignment=False)
 
 # AI Insights schemas
 class SpendingAnalysis(BaseModel):
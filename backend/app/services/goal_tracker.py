@@ -1,12 +1,34 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
 from app import models
 from datetime import datetime
-from typing import List
-from app.ai.goal_matcher import GoalMatcher
+from typing import Dict, List, Tuple
+from app.ai.goal_matcher import GoalMatcher, HAS_NUMPY
+
+if HAS_NUMPY:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Which transaction type counts toward each goal type
+GOAL_TYPE_COUNTED_TRANSACTION = {
+    "savings": "income",       # Only income counts, expenses are ignored
+    "debt_payoff": "expense",  # Only payments (expenses) count
+    "investment": "expense",   # Only investment expenses count
+    "purchase": "income",      # Income adds
+}
+
+# Minimum NLP relevance score for a transaction to count toward a goal
+RELEVANCE_THRESHOLD = 0.35
 
 class GoalTracker:
     """Service to automatically track goal progress based on transactions using NLP matching."""
     
+    # Shared across instances; per-goal scoring runs here, DB writes stay on the caller's thread
+    _executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="goal-scoring")
+    
     def __init__(self):
         self.goal_matcher = GoalMatcher()
     
@@ -14,84 +36,88 @@ class GoalTracker:
         """
         Calculate progress toward a goal based on transactions using NLP to match relevant transactions.
         """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        
         if not transactions:
-            print(f"  No transactions found for user")
+            logger.debug("No transactions found for user")
             return 0.0
         
         # Use ALL transactions (not just those after goal creation)
         # This makes it easier to track goals - you can create a goal and it will count existing transactions
-        relevant_transactions = list(transactions)  # Simply use all transactions
+        counted_type = GOAL_TYPE_COUNTED_TRANSACTION.get(goal.goal_type)
+        features = self.goal_matcher.goal_features(goal)
         
-        print(f"  Total transactions available: {len(transactions)}")
+        if debug:
+            logger.debug("Calculating progress for goal '%s' (type: %s), keywords: %s, checking %d transactions",
+                         goal.name, goal.goal_type, features[0], len(transactions))
         
         # Use NLP to match transactions to this specific goal
         total = 0.0
         matched_count = 0
         
-        print(f"\n  Calculating progress for goal: '{goal.name}' (type: {goal.goal_type})")
-        print(f"  Goal keywords: {self.goal_matcher.extract_keywords_from_goal(goal)}")
-        print(f"  Checking {len(relevant_transactions)} transactions...")
-        
-        for t in relevant_transactions:
+        for t in transactions:
             # Check if transaction is relevant to this goal using NLP
-            score = self.goal_matcher.calculate_relevance_score(t, goal)
+            score = self.goal_matcher.calculate_relevance_score(t, goal, features)
             
-            # Show all transactions being checked for debugging
-            if score > 0:
-                print(f"    Checking: '{t.description}' → score: {score:.2f}")
-            
-            if score < 0.35:  # Reasonable threshold
+            if score < RELEVANCE_THRESHOLD:  # Reasonable threshold
                 continue  # Skip transactions not related to this goal
             
-            print(f"    ✓ Matched: '{t.description}' (score: {score:.2f}, type: {t.transaction_type}, amount: ${abs(t.amount):.2f})")
+            # savings/purchase count income, debt_payoff/investment count expenses; the rest is ignored
+            if counted_type is None or t.transaction_type != counted_type:
+                if debug:
+                    logger.debug("Skipped '%s' (score: %.2f): %s doesn't count toward %s goals",
+                                 t.description, score, t.transaction_type, goal.goal_type)
+                continue
             
-            if goal.goal_type == "savings":
-                # For savings: ONLY income counts, expenses are ignored
-                if t.transaction_type == "income":
-                    matched_count += 1
-                    contribution = abs(t.amount)  # Count FULL amount if it matches
-                    total += contribution
-                    print(f"      → Added ${contribution:.2f} to savings goal (total now: ${total:.2f})")
-                else:
-                    print(f"      → Skipped: expenses don't count toward savings goals")
-                    
-            elif goal.goal_type == "debt_payoff":
-                # For debt payoff: only payments (expenses) count
-                if t.transaction_type == "expense":
-                    matched_count += 1
-                    contribution = abs(t.amount)  # Count FULL amount
-                    total += contribution
-                    print(f"      → Added ${contribution:.2f} to debt payoff goal (total now: ${total:.2f})")
-                else:
-                    print(f"      → Skipped: income doesn't count toward debt payoff goals")
-                    
-            elif goal.goal_type == "investment":
-                # For investment: only investment expenses count
-                if t.transaction_type == "expense":
-                    matched_count += 1
-                    contribution = abs(t.amount)  # Count FULL amount
-                    total += contribution
-                    print(f"      → Added ${contribution:.2f} to investment goal (total now: ${total:.2f})")
-                else:
-                    print(f"      → Skipped: income doesn't count toward investment goals")
-                    
-            elif goal.goal_type == "purchase":
-                # For purchase: income adds
-                if t.transaction_type == "income":
-                    matched_count += 1
-                    contribution = abs(t.amount)  # Count FULL amount
-                    total += contribution
-                    print(f"      → Added ${contribution:.2f} to purchase goal (total now: ${total:.2f})")
-                else:
-                    print(f"      → Skipped: expenses don't count toward purchase goals")
-        
-        if matched_count == 0:
-            print(f"    ✗ No transactions matched this goal")
-        else:
-            print(f"    → Final total: ${total:.2f} (matched {matched_count} transactions)")
+            matched_count += 1
+            total += abs(t.amount)  # Count FULL amount if it matches
+            if debug:
+                logger.debug("Matched '%s' (score: %.2f, type: %s), added $%.2f (total now: $%.2f)",
+                             t.description, score, t.transaction_type, abs(t.amount), total)
+        
+        if debug:
+            logger.debug("Goal '%s' final total: $%.2f (matched %d transactions)", goal.name, total, matched_count)
         
         return max(0.0, total)  # Don't go negative
     
+    def transaction_contribution(self, goal: models.Goal, transaction) -> float:
+        """Amount a single transaction contributes to a goal (0.0 if it doesn't count)."""
+        if GOAL_TYPE_COUNTED_TRANSACTION.get(goal.goal_type) != transaction.transaction_type:
+            return 0.0
+        if self.goal_matcher.calculate_relevance_score(transaction, goal) < RELEVANCE_THRESHOLD:
+            return 0.0
+        return abs(transaction.amount)
+    
+    def apply_transaction_deltas(self, user_id: int, changes: List[Tuple[object, int]], db: Session):
+        """
+        Incrementally adjust goal progress for a set of transaction changes.
+        
+        `changes` is a list of (transaction, sign) pairs: +1 for a transaction that was added,
+        -1 for one that was removed (an edit is a -1 of the old values and a +1 of the new).
+        Each goal's deltas are summed first and written in a single commit, so a write costs
+        O(goals x changed transactions) instead of rescoring every transaction.
+        """
+        goals = db.query(models.Goal).filter(
+            models.Goal.user_id == user_id
+        ).all()
+        
+        updated_goals = []
+        for goal in goals:
+            delta = sum(sign * self.transaction_contribution(goal, t) for t, sign in changes)
+            if delta:
+                goal.current_amount = max(0.0, (goal.current_amount or 0.0) + delta)
+                goal.updated_at = datetime.now()
+                updated_goals.append(goal)
+        
+        if updated_goals:
+            db.commit()
+        
+        return updated_goals
+    
+    def apply_transaction_delta(self, transaction, sign: int, db: Session):
+        """Incrementally adjust goal progress for one added (+1) or removed (-1) transaction."""
+        return self.apply_transaction_deltas(transaction.user_id, [(transaction, sign)], db)
+    
     def update_goal_progress(self, goal: models.Goal, db: Session):
         """Update a single goal's progress based on all transactions using NLP matching."""
         user_id = goal.user_id
@@ -113,6 +139,44 @@ class GoalTracker:
         
         return goal
     
+    def _batch_goal_progress(self, goals: List[models.Goal], transactions: List[models.Transaction]) -> Dict[int, float]:
+        """
+        Progress for every goal, encoding the transactions once and scoring each goal with one mat-vec.
+        
+        Same result as calling calculate_goal_progress per goal, without re-scanning descriptions per goal.
+        """
+        vocabulary = self.goal_matcher.build_vocabulary(goals)
+        transaction_matrix = self.goal_matcher.encode_transactions(transactions, vocabulary)
+        transaction_types = np.array([t.transaction_type for t in transactions], dtype=object)
+        amounts = np.abs(np.fromiter((t.amount for t in transactions), dtype=np.float64, count=len(transactions)))
+        
+        if len(goals) == 1:
+            return {goals[0].id: self._score_goal(goals[0], vocabulary, transaction_matrix, transaction_types, amounts)}
+        
+        # Goals are scored independently and NumPy releases the GIL in the mat-vec
+        progress_values = self._executor.map(
+            lambda goal: self._score_goal(goal, vocabulary, transaction_matrix, transaction_types, amounts),
+            goals
+        )
+        return {goal.id: value for goal, value in zip(goals, progress_values)}
+    
+    def _score_goal(
+        self,
+        goal: models.Goal,
+        vocabulary: Dict[str, int],
+        transaction_matrix: "np.ndarray",
+        transaction_types: "np.ndarray",
+        amounts: "np.ndarray"
+    ) -> float:
+        """Progress for one goal from the shared transaction encoding."""
+        counted_type = GOAL_TYPE_COUNTED_TRANSACTION.get(goal.goal_type)
+        if counted_type is None:
+            return 0.0
+        goal_vector = self.goal_matcher.encode_goal(goal, vocabulary)
+        scores = self.goal_matcher.score_matrix(transaction_matrix, goal_vector, goal, transaction_types)
+        mask = (scores >= RELEVANCE_THRESHOLD) & (transaction_types == counted_type)
+        return max(0.0, float(amounts[mask].sum()))
+    
     def update_all_goals(self, user_id: int, db: Session):
         """Update progress for all goals of a user using NLP matching."""
         goals = db.query(models.Goal).filter(
@@ -120,7 +184,7 @@ class GoalTracker:
         ).all()
         
         if not goals:
-            print(f"No goals found for user {user_id}")
+            logger.debug("No goals found for user %s", user_id)
             return []
         
         # Get all transactions once
@@ -128,27 +192,26 @@ class GoalTracker:
             models.Transaction.user_id == user_id
         ).all()
         
-        print(f"\n{'='*60}")
-        print(f"Updating {len(goals)} goals with {len(transactions)} transactions using NLP matching")
-        if len(transactions) > 0:
-            print(f"Sample transactions: {[t.description for t in transactions[:3]]}")
-        print(f"{'='*60}")
+        logger.debug("Updating %d goals with %d transactions using NLP matching", len(goals), len(transactions))
+        
+        batch_progress = self._batch_goal_progress(goals, transactions) if HAS_NUMPY and transactions else None
         
         updated_goals = []
         for goal in goals:
             old_progress = goal.current_amount
-            new_progress = self.calculate_goal_progress(goal, transactions)
+            if batch_progress is not None:
+                new_progress = batch_progress[goal.id]
+            else:
+                new_progress = self.calculate_goal_progress(goal, transactions)
             goal.current_amount = new_progress
             goal.updated_at = datetime.now()
             updated_goals.append(goal)
             if abs(old_progress - new_progress) > 0.01:  # Only log if changed significantly
-                print(f"\n✓ Goal '{goal.name}': ${old_progress:.2f} → ${new_progress:.2f}")
+                logger.debug("Goal '%s': $%.2f -> $%.2f", goal.name, old_progress, new_progress)
         
         db.commit()
         
         for goal in updated_goals:
             db.refresh(goal)
         
-        print(f"\n{'='*60}\n")
-        
         return updated_goals
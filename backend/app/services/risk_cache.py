@@ -0,0 +1,24 @@
+import threading
+from typing import Optional, Tuple
+from cachetools import TTLCache
+
+# Recent risk inputs per user, shared by back-to-back risk and stress-test calls.
+# Transaction and goal writes invalidate the entry; the TTL bounds staleness otherwise.
+# The cache is per process, so with several server workers a write only clears it in one of them.
+_risk_inputs_cache = TTLCache(maxsize=128, ttl=60)
+_risk_inputs_lock = threading.Lock()
+
+def get_risk_inputs(user_id: int) -> Optional[Tuple]:
+    """Return the cached (transactions, goals) risk inputs for a user, or None."""
+    with _risk_inputs_lock:
+        return _risk_inputs_cache.get(user_id)
+
+def set_risk_inputs(user_id: int, inputs: Tuple):
+    """Cache the (transactions, goals) risk inputs for a user."""
+    with _risk_inputs_lock:
+        _risk_inputs_cache[user_id] = inputs
+
+def invalidate_risk_inputs(user_id: int):
+    """Drop the cached risk inputs for a user after their transactions or goals change."""
+    with _risk_inputs_lock:
+        _risk_inputs_cache.pop(user_id, None)
@@ -1,57 +1,147 @@
-"""Check what's stored in the database"""
+"""Check what's stored in the database
+
+Usage: python check_database.py [--limit N]
+The ALL TRANSACTIONS listing shows the newest N rows (default: $CHECK_DB_LIMIT or 500).
+"""
+import argparse
+import io
+import os
+import sys
+from sqlalchemy import func, select
 from app.database import SessionLocal
 from app.models import User, Transaction, Goal, Alert
 
+BATCH_SIZE = 1000
+FLUSH_BYTES = 1 << 20
+
+def non_negative_int(value):
+    """argparse type for a row count: an int >= 0."""
+    try:
+        n = int(value)
+    except ValueError:
+        n = -1
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {value!r}")
+    return n
+
+parser = argparse.ArgumentParser(description="Check what's stored in the database")
+# A string default goes through `type` too, so a bad $CHECK_DB_LIMIT gets the same usage error
+parser.add_argument(
+    "--limit", type=non_negative_int, default=os.environ.get("CHECK_DB_LIMIT", "500"),
+    help="max rows in the ALL TRANSACTIONS listing (default: $CHECK_DB_LIMIT or 500)"
+)
+LIMIT = parser.parse_args().limit
+
+# Row formatters; rows are unpacked positionally in the column order selected below.
+# Fixed-width columns are padded with ljust/rjust, which skips the format-spec parser.
+def format_row(day, description, amount, transaction_type):
+    """Format a listing row: day | description | amount | type."""
+    return " | ".join((str(day), description.ljust(30), ("$%.2f" % abs(amount)).rjust(10), transaction_type.ljust(8)))
+
+def format_recent_row(day, description, amount, transaction_type, category):
+    """Format a recent-transactions row: the listing row plus the category."""
+    return format_row(day, description, amount, transaction_type) + " | " + category
+
+# All output goes through one buffer that is written to stdout in a single call,
+# or in FLUSH_BYTES chunks when the listing is large enough to need it
+buf = io.StringIO()
+
+def out(line=""):
+    """Append a line to the output buffer."""
+    buf.write(line)
+    buf.write("\n")
+
+def flush_output(min_bytes=0):
+    """Write the buffered output to stdout once it holds at least min_bytes, then reset it."""
+    if buf.tell() > min_bytes:
+        sys.stdout.write(buf.getvalue())
+        buf.seek(0)
+        buf.truncate()
+
 db = SessionLocal()
 
-print("\n" + "="*60)
-print("DATABASE CONTENTS")
-print("="*60)
+out("\n" + "="*60)
+out("DATABASE CONTENTS")
+out("="*60)
+
+# Counts, fetched together as scalar subqueries in one round trip
+user_count, txn_count, goal_count, alert_count = db.execute(select(
+    select(func.count()).select_from(User).scalar_subquery(),
+    select(func.count()).select_from(Transaction).scalar_subquery(),
+    select(func.count()).select_from(Goal).scalar_subquery(),
+    select(func.count()).select_from(Alert).scalar_subquery()
+)).one()
+out(f"\nUsers: {user_count}")
+out(f"Transactions: {txn_count}")
+out(f"Goals: {goal_count}")
+out(f"Alerts: {alert_count}")
 
-# Counts
-print(f"\nUsers: {db.query(User).count()}")
-print(f"Transactions: {db.query(Transaction).count()}")
-print(f"Goals: {db.query(Goal).count()}")
-print(f"Alerts: {db.query(Alert).count()}")
+# Newest-first transactions. Only the printed columns are selected, so rows are
+# plain tuples rather than ORM objects. The day is cut from the timestamp in SQL
+# (a string on SQLite, a date on Postgres; both print the same).
+# The ORDER BY relies on the index on Transaction.date (index=True in app/models.py),
+# which the database reads backwards for DESC, so the LIMIT queries stop after k rows
+# instead of sorting the table.
+txn_stmt = select(
+    func.date(Transaction.date).label("day"),
+    Transaction.description,
+    Transaction.amount,
+    Transaction.transaction_type,
+    Transaction.category
+).order_by(Transaction.date.desc())
 
 # Recent Transactions
-print("\n" + "-"*60)
-print("RECENT TRANSACTIONS (Last 5)")
-print("-"*60)
-for t in db.query(Transaction).order_by(Transaction.date.desc()).limit(5).all():
-    amount_str = f"${abs(t.amount):.2f}"
-    print(f"{t.date.date()} | {t.description:30s} | {amount_str:>10s} | {t.transaction_type:8s} | {t.category or 'N/A'}")
+out("\n" + "-"*60)
+out("RECENT TRANSACTIONS (Last 5)")
+out("-"*60)
+for day, description, amount, transaction_type, category in db.execute(txn_stmt.limit(5)):
+    out(format_recent_row(day, description, amount, transaction_type, category or 'N/A'))
 
 # All Transactions Summary
-print("\n" + "-"*60)
-print("ALL TRANSACTIONS")
-print("-"*60)
-all_txns = db.query(Transaction).order_by(Transaction.date.desc()).all()
-for t in all_txns:
-    amount_str = f"${abs(t.amount):.2f}"
-    print(f"{t.date.date()} | {t.description:30s} | {amount_str:>10s} | {t.transaction_type:8s}")
+out("\n" + "-"*60)
+out("ALL TRANSACTIONS")
+out("-"*60)
+# Stream in fixed-size batches so memory stays flat however large the table is;
+# the buffer is flushed between batches only once it grows past FLUSH_BYTES
+result = db.execute(txn_stmt.limit(LIMIT).execution_options(yield_per=BATCH_SIZE))
+for batch in result.partitions():
+    for day, description, amount, transaction_type, _category in batch:
+        out(format_row(day, description, amount, transaction_type))
+    flush_output(FLUSH_BYTES)
+if txn_count > LIMIT:
+    out(f"... {txn_count - LIMIT} older transactions not shown (use --limit to see more)")
 
 # Goals
-print("\n" + "-"*60)
-print("GOALS")
-print("-"*60)
-for g in db.query(Goal).all():
+out("\n" + "-"*60)
+out("GOALS")
+out("-"*60)
+for g in db.execute(select(
+    Goal.name,
+    Goal.current_amount,
+    Goal.target_amount,
+    Goal.goal_type
+)):
     progress_pct = (g.current_amount / g.target_amount * 100) if g.target_amount > 0 else 0
-    print(f"{g.name:25s} | ${g.current_amount:>8.2f} / ${g.target_amount:>8.2f} ({progress_pct:>5.1f}%) | {g.goal_type}")
+    out(f"{g.name:25s} | ${g.current_amount:>8.2f} / ${g.target_amount:>8.2f} ({progress_pct:>5.1f}%) | {g.goal_type}")
 
 # Summary Stats
-print("\n" + "="*60)
-print("SUMMARY")
-print("="*60)
-total_income = sum(abs(t.amount) for t in all_txns if t.transaction_type == "income")
-total_expenses = sum(abs(t.amount) for t in all_txns if t.transaction_type == "expense")
+out("\n" + "="*60)
+out("SUMMARY")
+out("="*60)
+totals_by_type = dict(db.execute(
+    select(Transaction.transaction_type, func.sum(func.abs(Transaction.amount)))
+    .group_by(Transaction.transaction_type)
+).all())
+total_income = totals_by_type.get("income") or 0.0
+total_expenses = totals_by_type.get("expense") or 0.0
 net = total_income - total_expenses
 
-print(f"Total Income:   ${total_income:>10.2f}")
-print(f"Total Expenses: ${total_expenses:>10.2f}")
-print(f"Net:            ${net:>10.2f}")
-print("="*60 + "\n")
+out(f"Total Income:   ${total_income:>10.2f}")
+out(f"Total Expenses: ${total_expenses:>10.2f}")
+out(f"Net:            ${net:>10.2f}")
+out("="*60 + "\n")
 
+flush_output()
 db.close()
 
 
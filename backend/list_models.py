@@ -1,23 +1,60 @@
 """List available Gemini models"""
+import hashlib
+import json
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 gemini_key = os.getenv("GEMINI_API_KEY")
 
+# The model list rarely changes, so cache it per API key for an hour
+CACHE_TTL_SECONDS = 3600
+cache_key = hashlib.sha256((gemini_key or "").encode()).hexdigest()[:16]
+cache_path = os.path.join(os.path.expanduser("~"), ".cache", "finsage", f"models_{cache_key}.json")
+
+def load_cached_models():
+    """Return cached model names if the cache file is fresh, else None."""
+    try:
+        if os.path.getmtime(cache_path) > time.time() - CACHE_TTL_SECONDS:
+            with open(cache_path) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_cached_models(model_names):
+    """Write the cache atomically: dump to a temp file in the same directory, then rename over."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(model_names, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Caching is best-effort
+
 print("Listing available Gemini models...\n")
 
 try:
-    import google.generativeai as genai
-    genai.configure(api_key=gemini_key)
+    model_names = load_cached_models()
+    
+    if model_names is None:
+        import google.generativeai as genai
+        genai.configure(api_key=gemini_key)
+        
+        model_names = [
+            m.name for m in genai.list_models()
+            if 'generateContent' in m.supported_generation_methods
+        ]
+        save_cached_models(model_names)
     
     print("Available models:")
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            print(f"  - {m.name}")
+    for name in model_names:
+        print(f"  - {name}")
     
 except Exception as e:
     print(f"Error: {e}")
 
-
@@ -1,38 +1,97 @@
 #!/usr/bin/env python
-"""Simple script to start the server and show any errors"""
+"""Simple script to start the server and show any errors
+
+Runs a single worker; set WEB_CONCURRENCY=N to run N worker processes instead
+(per-worker caches are then not invalidated across workers, see below).
+"""
+import os
 import sys
 import traceback
 
-try:
-    print("Starting server...")
-    import uvicorn
-    from app.main import app
-    print("✓ App imported successfully!")
-    # Try ports 8000, 8001, 8002, etc. until we find a free one
-    import socket
-    port = 8000
-    max_attempts = 10
-    
-    for attempt in range(max_attempts):
+def listening_ports():
+    """Return the local TCP ports in LISTEN state, from one read of the kernel's socket table."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            return {c.laddr.port for c in psutil.net_connections(kind='tcp') if c.status == psutil.CONN_LISTEN}
+        except psutil.AccessDenied:
+            pass  # e.g. macOS without root; fall through
+    # Without psutil, Linux exposes the same table as text; the state column is hex, 0A = LISTEN
+    ports = set()
+    for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(path) as f:
+                next(f)  # Header row
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == "0A":
+                        ports.add(int(fields[1].rsplit(":", 1)[1], 16))
+        except OSError:
+            pass  # Not Linux, or no IPv6
+    return ports
+
+# Guarded so worker processes, which re-import this module, don't start servers themselves
+if __name__ == "__main__":
+    try:
+        print("Starting server...")
+        import uvicorn
+        # Pick the first port in 8000-8009 that nothing is listening on, from one snapshot
+        # of the kernel's socket table, otherwise let the OS pick a free port in one bind.
+        # The bound socket is handed to uvicorn as-is, so nothing can take the port in between.
+        import socket
+        max_attempts = 10
+        used = listening_ports()  # Empty where neither psutil nor /proc is available; just try 8000
+        port = next((p for p in range(8000, 8000 + max_attempts) if p not in used), 0)
+        
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
             sock.bind(('127.0.0.1', port))
-            sock.close()
-            break  # Port is free, use it
+            port = sock.getsockname()[1]
         except OSError:
-            port += 1
-            if attempt == max_attempts - 1:
-                print(f"ERROR: Could not find a free port after {max_attempts} attempts")
-                sys.exit(1)
-    
-    if port != 8000:
-        print(f"Port 8000 is busy, using port {port} instead")
-    
-    print(f"Starting uvicorn on http://127.0.0.1:{port}")
-    print(f"Frontend should connect to: http://localhost:{port}")
-    uvicorn.run(app, host="127.0.0.1", port=port, log_level="info")
-except Exception as e:
-    print(f"ERROR: {e}")
-    traceback.print_exc()
-    sys.exit(1)
+            sock.close()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        sock.listen(128)
+        
+        # Import the app only once a port is secured, so a port problem fails fast
+        from app.main import app
+        print("✓ App imported successfully!")
+        
+        if port != 8000:
+            print(f"Port 8000 is busy, using port {port} instead")
+        
+        print(f"Starting uvicorn on http://127.0.0.1:{port}")
+        print(f"Frontend should connect to: http://localhost:{port}")
+        # httptools and uvloop both ship with uvicorn[standard]; uvloop has no Windows build
+        try:
+            import uvloop
+            loop = "uvloop"
+        except ImportError:
+            loop = "asyncio"
+        
+        # One worker by default. Multiple workers are opt-in via WEB_CONCURRENCY=N: each worker
+        # keeps its own in-process caches (risk inputs, goal features, categorizer results),
+        # so invalidation on a write only reaches the worker that handled it and the others
+        # can serve stale /api/risk results until their cache entries expire (up to 60s).
+        # Each worker also loads its own spaCy model and compiles its own Numba kernels.
+        workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+        config = uvicorn.Config(
+            "app.main:app", host="127.0.0.1", port=port, log_level="info",
+            loop=loop, http="httptools", workers=workers
+        )
+        server = uvicorn.Server(config)
+        if workers > 1:
+            from uvicorn.supervisors import Multiprocess
+            print(f"Starting {workers} workers")
+            Multiprocess(config, target=server.run, sockets=[sock]).run()
+        else:
+            server.run(sockets=[sock])
+    except Exception as e:
+        print(f"ERROR: {e}")
+        traceback.print_exc()
+        sys.exit(1)
 
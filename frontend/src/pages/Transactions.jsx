@@ -1,8 +1,12 @@
 import { useEffect, useState } from 'react'
 import { Plus, Search, Filter, Upload, Camera } from 'lucide-react'
-import { getTransactions, createTransaction, deleteTransaction, uploadReceipt } from '../services/api'
+import { getTransactions, createTransaction, deleteTransaction, uploadReceipt, getReceiptStatus } from '../services/api'
 import { format } from 'date-fns'
 
+// Receipt status is polled once a second; give up after two minutes
+const RECEIPT_POLL_INTERVAL_MS = 1000
+const RECEIPT_MAX_POLLS = 120
+
 export default function Transactions() {
   const [transactions, setTransactions] = useState([])
   const [loading, setLoading] = useState(true)
@@ -93,7 +97,22 @@ export default function Transactions() {
 
     try {
       setUploadingReceipt(true)
-      const response = await uploadReceipt(selectedFile)
+      const { data: { receipt_id } } = await uploadReceipt(selectedFile)
+      // OCR runs in the background; poll until the receipt is done or failed, or we time out
+      let response = await getReceiptStatus(receipt_id)
+      let polls = 0
+      while (response.data.status === 'pending' || response.data.status === 'processing') {
+        if (++polls > RECEIPT_MAX_POLLS) {
+          alert('Receipt processing is taking too long. Please try again later.')
+          return
+        }
+        await new Promise((resolve) => setTimeout(resolve, RECEIPT_POLL_INTERVAL_MS))
+        response = await getReceiptStatus(receipt_id)
+      }
+      if (response.data.status === 'failed') {
+        alert(response.data.error || 'Failed to process receipt.')
+        return
+      }
       alert(`Receipt processed! Created transaction: ${response.data.transaction.description}`)
       setShowReceiptModal(false)
       setSelectedFile(null)
@@ -97,6 +97,9 @@ export const uploadReceipt = (file) => {
   })
 }
 
+export const getReceiptStatus = (receiptId) => 
+  api.get(`/api/receipts/upload/${receiptId}/status`)
+
 export const getSubscriptions = () => 
   api.get('/api/receipts/subscriptions')
 